@@ -14,7 +14,7 @@ __version__ = "0.3.1"
 
 
 def run_server(handlers=[], host=None, port=None, level=logging.INFO,
-               done=None, ready=None):
+               done=None, ready=None, profile_signal=False):
     """Creates a new :class:`LogServer` and starts it. This is intended as a
     target function for a thread or process and is included for backwards
     compatibility. For more flexibility, it is recommended to use
@@ -28,9 +28,11 @@ def run_server(handlers=[], host=None, port=None, level=logging.INFO,
         signal the server to stop.
     :param ready: :class:`threading.Event` or :class:`multiprocessing.Event` to
         indicate to the parent process that the server is ready.
+    :param bool profile_signal: Toggle profiling when receiving ``SIGUSR1``.
 
     """
     server = LogServer(handlers, host, port, level)
+    server.profile_signal = profile_signal
 
     # Setting this to use the multiprocessing versions for most flexibility.
     server.done = done if done is not None else multiprocessing.Event()
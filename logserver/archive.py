@@ -0,0 +1,321 @@
+"""Archive logs written by :class:`logserver.handlers.SQLiteHandler` to
+compressed, columnar chunk files and read them back.
+
+Each chunk file holds a batch of rows stored column by column. Every column is
+serialized as JSON and compressed with :mod:`zlib` independently, followed by
+a footer recording the byte range of each column and the minimum and maximum
+timestamp and level of the chunk. Readers use the footer to skip chunks
+outside of a time or level range and only decompress the columns they need.
+
+Export a database with::
+
+    python -m logserver.archive export logs.sqlite archive/
+
+and search the archive with::
+
+    python -m logserver.archive read archive/ --start 1500000000 --level 40
+
+"""
+
+from __future__ import print_function
+
+from argparse import ArgumentParser
+import json
+import os
+import os.path as osp
+import sqlite3
+import struct
+import zlib
+
+from .handlers import check_table_name
+
+MAGIC = b"LSA1"
+CHUNK_EXTENSION = ".chunk"
+
+# Footer length and magic bytes at the end of each chunk file
+_TRAILER = struct.Struct(">I4s")
+
+
+def _range(values):
+    values = [value for value in values if value is not None]
+    if len(values) == 0:
+        return [None, None]
+    return [min(values), max(values)]
+
+
+def write_chunk(path, names, rows, compression=6):
+    """Write a batch of rows to a chunk file. The chunk is written to a
+    temporary file first and renamed into place, so an interrupted write does
+    not leave a truncated chunk behind.
+
+    :param str path: Path of the chunk file to write.
+    :param list names: Column names.
+    :param list rows: List of row tuples.
+    :param int compression: :mod:`zlib` compression level.
+    :returns: The chunk footer.
+
+    """
+    columns = dict(zip(names, (list(column) for column in zip(*rows))))
+    footer = {
+        "rows": len(rows),
+        "time": _range(columns.get("timestamp", [])),
+        "levelno": _range(columns.get("levelno", [])),
+        "max_id": _range(columns.get("id", []))[1],
+        "columns": {},
+    }
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        offset = len(MAGIC)
+        for name in names:
+            data = json.dumps(columns.get(name, [])).encode("utf-8")
+            data = zlib.compress(data, compression)
+            f.write(data)
+            footer["columns"][name] = [offset, len(data)]
+            offset += len(data)
+
+        data = json.dumps(footer).encode("utf-8")
+        f.write(data)
+        f.write(_TRAILER.pack(len(data), MAGIC))
+
+    os.rename(tmp_path, path)
+    return footer
+
+
+def read_footer(path):
+    """Read the footer of a chunk file.
+
+    :param str path: Path to the chunk file.
+    :returns: A dict with the number of ``rows``, ``[min, max]`` ranges for
+        ``time`` and ``levelno``, the largest row ``max_id``, and the byte
+        range of each column.
+
+    """
+    with open(path, "rb") as f:
+        return _read_footer(f)
+
+
+def _read_footer(f):
+    f.seek(-_TRAILER.size, os.SEEK_END)
+    length, magic = _TRAILER.unpack(f.read(_TRAILER.size))
+    if magic != MAGIC:
+        raise RuntimeError("Not a log archive chunk: " + f.name)
+    f.seek(-_TRAILER.size - length, os.SEEK_END)
+    return json.loads(f.read(length).decode("utf-8"))
+
+
+def read_chunk(path, columns=None):
+    """Read columns from a chunk file.
+
+    :param str path: Path to the chunk file.
+    :param list columns: Names of the columns to load. All columns are loaded
+        when not given.
+    :returns: A dict mapping column names to lists of values.
+
+    """
+    with open(path, "rb") as f:
+        footer = _read_footer(f)
+        if columns is None:
+            columns = list(footer["columns"])
+
+        result = {}
+        for name in columns:
+            if name not in footer["columns"]:
+                raise KeyError("No column named " + name)
+            offset, length = footer["columns"][name]
+            f.seek(offset)
+            data = zlib.decompress(f.read(length))
+            result[name] = json.loads(data.decode("utf-8"))
+
+    return result
+
+
+def list_chunks(directory, table_name="logs"):
+    """Return the sorted paths of chunk files for a table in ``directory``."""
+    prefix = table_name + "-"
+    return sorted(
+        osp.join(directory, filename) for filename in os.listdir(directory)
+        if filename.startswith(prefix) and filename.endswith(CHUNK_EXTENSION)
+    )
+
+
+def _chunk_index(path):
+    filename = osp.basename(path)
+    return int(filename[filename.rindex("-") + 1:-len(CHUNK_EXTENSION)])
+
+
+def export(db_path, directory, table_name="logs", batch_size=10000,
+           before=None, compression=6):
+    """Stream rows out of a SQLite log table into chunk files. At most
+    ``batch_size`` rows are held in memory at a time.
+
+    If ``directory`` already contains chunks for the table, only rows with an
+    ``id`` greater than the largest archived ``id`` are exported, so running
+    an export repeatedly never archives a row twice.
+
+    Timestamps come from client clocks and need not increase with ``id``.
+    With ``before``, only rows preceding the first row with a later timestamp
+    are exported so that no row is skipped by a later incremental export.
+
+    :param str db_path: Path to the SQLite database.
+    :param str directory: Directory to write chunk files to. It is created if
+        it does not exist.
+    :param str table_name: Name of the log table.
+    :param int batch_size: Number of rows per chunk.
+    :param float before: Only export rows up to the first row with a timestamp
+        at or after this.
+    :param int compression: :mod:`zlib` compression level.
+    :returns: List of paths to the written chunk files.
+
+    """
+    check_table_name(table_name)
+    if not osp.isdir(directory):
+        os.makedirs(directory)
+
+    conditions, params = [], []
+    index = 0
+    chunks = list_chunks(directory, table_name)
+    if len(chunks) > 0:
+        newest = max(chunks, key=_chunk_index)
+        max_id = read_footer(newest).get("max_id")
+        if max_id is None:
+            raise RuntimeError("Cannot determine the last archived row in " +
+                               newest + "; refusing to append")
+        conditions.append("id > ?")
+        params.append(max_id)
+        index = _chunk_index(newest) + 1
+    if before is not None:
+        conditions.append(
+            "id < COALESCE((SELECT MIN(id) FROM {table:s} WHERE timestamp >= ?), "
+            "(SELECT MAX(id) FROM {table:s}) + 1)".format(table=table_name))
+        params.append(before)
+
+    query = "SELECT * FROM {:s}".format(table_name)
+    if len(conditions) > 0:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY id"
+
+    paths = []
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.execute(query, params)
+        names = [column[0] for column in cursor.description]
+
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if len(rows) == 0:
+                break
+            path = osp.join(directory, "{:s}-{:06d}{:s}".format(
+                table_name, index, CHUNK_EXTENSION))
+            write_chunk(path, names, rows, compression)
+            paths.append(path)
+            index += 1
+    finally:
+        conn.close()
+
+    return paths
+
+
+def read_archive(directory, table_name="logs", start=None, end=None,
+                 levelno=None, columns=None):
+    """Iterate over archived rows, skipping chunks which cannot contain
+    matching rows.
+
+    :param str directory: Directory containing chunk files.
+    :param str table_name: Name of the archived log table.
+    :param float start: Only yield rows with a timestamp at or after this.
+    :param float end: Only yield rows with a timestamp before this.
+    :param int levelno: Only yield rows with at least this level.
+    :param list columns: Columns to include in each row. All columns are
+        included when not given.
+    :returns: Generator of dicts mapping column names to values.
+
+    """
+    for path in list_chunks(directory, table_name):
+        footer = read_footer(path)
+        min_time, max_time = footer["time"]
+        max_level = footer["levelno"][1]
+
+        if start is not None and (max_time is None or max_time < start):
+            continue
+        if end is not None and (min_time is None or min_time >= end):
+            continue
+        if levelno is not None and (max_level is None or max_level < levelno):
+            continue
+
+        names = list(footer["columns"]) if columns is None else list(columns)
+        needed = set(names)
+        if start is not None or end is not None:
+            needed.add("timestamp")
+        if levelno is not None:
+            needed.add("levelno")
+        data = read_chunk(path, sorted(needed))
+
+        for i in range(footer["rows"]):
+            if start is not None or end is not None:
+                timestamp = data["timestamp"][i]
+                if timestamp is None:
+                    continue
+                if start is not None and timestamp < start:
+                    continue
+                if end is not None and timestamp >= end:
+                    continue
+            if levelno is not None:
+                if data["levelno"][i] is None or data["levelno"][i] < levelno:
+                    continue
+            yield dict((name, data[name][i]) for name in names)
+
+
+def main():
+    """Entry point for exporting and reading log archives."""
+    parser = ArgumentParser(
+        description="Archive SQLite logs to compressed columnar chunks.")
+    parser.add_argument("-t", "--table", default="logs",
+                        help="Name of the log table")
+    subparsers = parser.add_subparsers(dest="command")
+
+    export_parser = subparsers.add_parser(
+        "export", help="Export a SQLite log table to chunk files")
+    export_parser.add_argument("filename", help="SQLite filename")
+    export_parser.add_argument("directory", help="Directory to write chunks to")
+    export_parser.add_argument("-b", "--batch-size", type=int, default=10000,
+                               help="Number of rows per chunk")
+    export_parser.add_argument("--before", type=float, default=None,
+                               help="Only export logs up to the first one at "
+                                    "or after this timestamp")
+
+    read_parser = subparsers.add_parser(
+        "read", help="Print archived logs matching the given criteria")
+    read_parser.add_argument("directory", help="Directory containing chunks")
+    read_parser.add_argument("--start", type=float, default=None,
+                             help="Earliest timestamp")
+    read_parser.add_argument("--end", type=float, default=None,
+                             help="Latest timestamp (exclusive)")
+    read_parser.add_argument("-l", "--level", type=int, default=None,
+                             help="Minimum log level")
+    read_parser.add_argument("-c", "--columns", default="timestamp,levelname,name,msg",
+                             help="Comma-separated list of columns to print")
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        paths = export(args.filename, args.directory, args.table,
+                       args.batch_size, args.before)
+        print("Wrote", len(paths), "chunks to", args.directory)
+    elif args.command == "read":
+        columns = args.columns.split(",")
+        for path in list_chunks(args.directory, args.table):
+            unknown = set(columns) - set(read_footer(path)["columns"])
+            if len(unknown) > 0:
+                parser.error("unknown columns: " + ", ".join(sorted(unknown)))
+        for row in read_archive(args.directory, args.table, args.start,
+                                args.end, args.level, columns):
+            print("\t".join(str(row[name]) for name in columns))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
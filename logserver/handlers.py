@@ -3,7 +3,100 @@ import traceback as tb
 import sqlite3
 
 
-class SQLiteHandler(logging.Handler):
+def check_table_name(table_name):
+    """Raise a :class:`RuntimeError` unless ``table_name`` is a valid log
+    table name, i.e., only contains alphanumeric characters.
+
+    """
+    for char in table_name:
+        if not char.isalnum():
+            raise RuntimeError("Invalid table name: " + table_name)
+
+
+class BatchHandlerMixin(object):
+    """Mixin for :class:`logging.Handler` subclasses which can emit several
+    records at once. :class:`logserver.server.LogServer` passes all records
+    received together to :meth:`handle_batch` so that the handler lock is
+    acquired once and I/O can be done in bulk.
+
+    Subclasses should override :meth:`emit_batch`; the default implementation
+    calls :meth:`emit` for each record. If :meth:`emit_batch` raises, each
+    record is emitted individually instead, so :meth:`emit_batch` should not
+    leave a partially emitted batch behind.
+
+    """
+    def handle_batch(self, records):
+        """Filter records and emit them with the handler lock held. Level
+        checks are the responsibility of the caller, as with
+        :meth:`logging.Handler.handle`.
+
+        :param list records: List of :class:`logging.LogRecord` objects.
+        :returns: The list of records which passed the filters.
+
+        """
+        filtered = []
+        for record in records:
+            rv = self.filter(record)
+            if isinstance(rv, logging.LogRecord):
+                record = rv
+            if rv:
+                filtered.append(record)
+
+        if len(filtered) > 0:
+            self.acquire()
+            try:
+                self.emit_batch(filtered)
+            except Exception:
+                # Retry one at a time so only failing records are lost
+                for record in filtered:
+                    try:
+                        self.emit(record)
+                    except Exception:
+                        self.handleError(record)
+            finally:
+                self.release()
+
+        return filtered
+
+    def emit_batch(self, records):
+        """Emit a list of records."""
+        for record in records:
+            self.emit(record)
+
+
+class StreamHandler(BatchHandlerMixin, logging.StreamHandler):
+    """A :class:`logging.StreamHandler` which writes and flushes a batch of
+    records at once.
+
+    """
+    def emit_batch(self, records):
+        terminator = getattr(self, "terminator", "\n")
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.format(record) + terminator)
+            except Exception:
+                self.handleError(record)
+
+        try:
+            self.stream.write("".join(lines))
+            self.flush()
+        except Exception:
+            self.handleError(records[-1])
+
+
+class FileHandler(StreamHandler, logging.FileHandler):
+    """A :class:`logging.FileHandler` which writes and flushes a batch of
+    records at once.
+
+    """
+    def emit_batch(self, records):
+        if self.stream is None:
+            self.stream = self._open()
+        super(FileHandler, self).emit_batch(records)
+
+
+class SQLiteHandler(BatchHandlerMixin, logging.Handler):
     """Handler to write logs to a SQLite database.
 
     :param str path: Path to SQLite file.
@@ -19,9 +112,7 @@ class SQLiteHandler(logging.Handler):
 
         self.path = path
 
-        for char in table_name:
-            if not char.isalnum():
-                raise RuntimeError("Invalid table name: " + table_name)
+        check_table_name(table_name)
         self.table = table_name
 
         with sqlite3.connect(self.path) as conn:
@@ -44,22 +135,31 @@ class SQLiteHandler(logging.Handler):
                 conn.execute("PRAGMA journal_mode = wal")
             conn.isolation_level = ""  # new default; not strictly necessary here
 
+    def _insert_query(self):
+        return "".join([
+            "INSERT INTO {:s}".format(self.table),
+            "(name, levelno, levelname, timestamp, pathname, lineno, threadName,",
+            " processName, msg, exc_info) ",
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        ])
+
+    @staticmethod
+    def _row(record):
+        if record.exc_info is not None:
+            exc = '\n'.join(tb.format_exception(*record.exc_info))
+        else:
+            exc = None
+
+        return (record.name, record.levelno, record.levelname,
+                record.created, record.pathname, record.lineno,
+                record.threadName, record.processName, record.msg, exc)
+
     def emit(self, record):
         with sqlite3.connect(self.path) as conn:
-            query = [
-                "INSERT INTO {:s}".format(self.table),
-                "(name, levelno, levelname, timestamp, pathname, lineno, threadName,",
-                " processName, msg, exc_info) ",
-                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
-            ]
-
-            if record.exc_info is not None:
-                exc = '\n'.join(tb.format_exception(*record.exc_info))
-            else:
-                exc = None
+            conn.execute(self._insert_query(), self._row(record))
 
-            conn.execute("".join(query),
-                         (record.name, record.levelno, record.levelname,
-                          record.created, record.pathname, record.lineno,
-                          record.threadName, record.processName, record.msg,
-                          exc))
+    def emit_batch(self, records):
+        """Insert all records in a single transaction."""
+        with sqlite3.connect(self.path) as conn:
+            conn.executemany(self._insert_query(),
+                             [self._row(record) for record in records])
@@ -0,0 +1,185 @@
+"""Profiling hooks for a running :class:`logserver.server.LogServer`.
+
+While profiling is enabled, the server's datagram handling methods are replaced
+with instrumented versions on the instance. When profiling is disabled the
+original methods are restored, so there is no cost on the receive loop.
+
+"""
+
+from __future__ import print_function
+
+import sys
+import threading as th
+import logging
+import cProfile
+import pstats
+from timeit import default_timer
+
+if sys.version_info.major >= 3:
+    import pickle
+    from io import StringIO
+else:
+    import cPickle as pickle
+    from StringIO import StringIO
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+#: Profile the receive loop with :mod:`cProfile`.
+CPROFILE = "cprofile"
+
+#: Time decoding and each handler call with a low-overhead timer.
+TIMER = "timer"
+
+
+class Profiler(object):
+    """Profiles datagram handling of a :class:`LogServer`.
+
+    :param LogServer server: Server to profile.
+    :param str path: File to write the report to.
+    :param str mode: Either :data:`CPROFILE` or :data:`TIMER`.
+    :param bool allocations: Also track memory allocations with
+        :mod:`tracemalloc` (Python 3 only).
+
+    """
+    def __init__(self, server, path, mode=CPROFILE, allocations=False):
+        if mode not in (CPROFILE, TIMER):
+            raise ValueError("Invalid profiling mode: " + str(mode))
+        if allocations and tracemalloc is None:
+            raise RuntimeError("tracemalloc is not available")
+
+        self.server = server
+        self.path = path
+        self.mode = mode
+        self.allocations = allocations
+
+        self._lock = th.Lock()
+        self._profile = None  # type: cProfile.Profile
+        self._timings = {}
+        self._records = 0
+        self._start_time = None  # type: float
+        self._started_tracing = False
+        self._labels = {}
+
+    def start(self):
+        """Install the instrumented datagram handling methods on the server."""
+        self._start_time = default_timer()
+        if self.allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+        if self.mode == CPROFILE:
+            self._profile = cProfile.Profile()
+            self.server._handle_datagrams = self._profiled
+        else:
+            self.server._decode = self._timed_decode
+            self.server._handle_batch = self._timed_handle_batch
+            self.server._handle_datagrams = self._timed
+
+    def stop(self):
+        """Restore the original datagram handling methods and write the
+        report. Must not be called from the thread handling datagrams, which
+        may be holding the profiler lock.
+
+        """
+        # Removing the instance attributes falls back to the class methods.
+        # Once the lock is acquired, no batch can still be using the hooks.
+        del self.server._handle_datagrams
+        if self.mode == TIMER:
+            del self.server._decode
+            del self.server._handle_batch
+
+        with self._lock:
+            elapsed = default_timer() - self._start_time
+            snapshot = None
+            if self.allocations:
+                snapshot = tracemalloc.take_snapshot()
+                if self._started_tracing:
+                    tracemalloc.stop()
+
+            with open(self.path, "w") as f:
+                f.write(self.report(elapsed, snapshot))
+
+    def _profiled(self, datagrams):
+        with self._lock:
+            self._records += len(datagrams)
+            self._profile.runcall(type(self.server)._handle_datagrams,
+                                  self.server, datagrams)
+
+    def _timed(self, datagrams):
+        with self._lock:
+            self._records += len(datagrams)
+            type(self.server)._handle_datagrams(self.server, datagrams)
+
+    def _timed_decode(self, data):
+        t0 = default_timer()
+        obj = pickle.loads(data[4:])
+        t1 = default_timer()
+        record = logging.makeLogRecord(obj)
+        t2 = default_timer()
+        self._add("unpickle", t1 - t0)
+        self._add("makeLogRecord", t2 - t1)
+        return record
+
+    def _timed_handle_batch(self, handler, records):
+        start = default_timer()
+        type(self.server)._handle_batch(handler, records)
+        self._add(self._label(handler) + ".handle", default_timer() - start,
+                  len(records))
+
+    def _label(self, handler):
+        try:
+            return self._labels[handler]
+        except KeyError:
+            pass
+
+        # The handler queue thread may modify the runtime handlers
+        label = "{:s}@{:x}".format(type(handler).__name__, id(handler))
+        for name, runtime_handler in list(self.server._runtime_handlers.items()):
+            if runtime_handler is handler:
+                label = name
+                break
+        self._labels[handler] = label
+        return label
+
+    def _add(self, stage, seconds, records=1):
+        calls, count, total = self._timings.get(stage, (0, 0, 0.))
+        self._timings[stage] = (calls + 1, count + records, total + seconds)
+
+    def report(self, elapsed, snapshot=None):
+        """Return the text of the profiling report.
+
+        :param float elapsed: Wall time spent profiling in seconds.
+        :param snapshot: :class:`tracemalloc.Snapshot` to summarize.
+
+        """
+        lines = [
+            "logserver profile ({:s})".format(self.mode),
+            "records: {:d}".format(self._records),
+            "elapsed: {:.3f} s".format(elapsed),
+            "",
+        ]
+
+        if self.mode == CPROFILE:
+            stream = StringIO()
+            stats = pstats.Stats(self._profile, stream=stream)
+            stats.sort_stats("cumulative").print_stats(40)
+            lines.append(stream.getvalue())
+        else:
+            lines.append("{:<40s} {:>10s} {:>10s} {:>12s} {:>16s}".format(
+                "stage", "calls", "records", "total (s)", "per record (us)"))
+            timings = sorted(self._timings.items(), key=lambda item: -item[1][2])
+            for stage, (calls, count, total) in timings:
+                lines.append("{:<40s} {:>10d} {:>10d} {:>12.6f} {:>16.3f}".format(
+                    stage, calls, count, total, 1e6 * total / count))
+            lines.append("")
+
+        if snapshot is not None:
+            lines.append("Top allocations:")
+            for stat in snapshot.statistics("lineno")[:25]:
+                lines.append(str(stat))
+            lines.append("")
+
+        return "\n".join(lines)
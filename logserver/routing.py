@@ -0,0 +1,151 @@
+import logging
+import threading as th
+
+
+class _Node(object):
+    """A single node of the :class:`RouteTable` trie, corresponding to one
+    dotted component of a logger name.
+
+    """
+    __slots__ = ("children", "routes")
+
+    def __init__(self):
+        self.children = {}
+        self.routes = []  # list of (level, handler) tuples
+
+
+class RouteTable(object):
+    """Maps logger name prefixes and levels to sets of handlers.
+
+    Prefixes follow the usual :mod:`logging` hierarchy: a route for
+    ``"worker"`` matches records from ``"worker"`` and ``"worker.db"`` but not
+    from ``"workers"``. The empty prefix matches every logger.
+
+    Routes are stored in a trie keyed on name components. Resolved handler
+    tuples are memoized per ``(name, levelno)`` so that once a logger has been
+    seen, dispatching a record costs a single dict lookup regardless of how
+    many routes exist. The cache is cleared whenever routes change.
+
+    Logger names come from unauthenticated datagrams, so the cache is also
+    cleared once it holds ``max_cache_size`` entries to keep senders using
+    many distinct names from growing it without bound.
+
+    :param int max_cache_size: Maximum number of memoized lookups.
+
+    """
+    def __init__(self, max_cache_size=10000):
+        self.max_cache_size = max_cache_size
+        self._root = _Node()
+        self._cache = {}
+        self._lock = th.Lock()
+
+    def __len__(self):
+        return sum(len(node.routes) for node in self._nodes())
+
+    def _nodes(self):
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(node.children.values())
+
+    @staticmethod
+    def _split(name):
+        return name.split(".") if name else []
+
+    def add(self, prefix, handler, level=logging.NOTSET):
+        """Route records from loggers matching ``prefix`` with a level of at
+        least ``level`` to ``handler``. Adding an existing route updates its
+        level.
+
+        :param str prefix: Logger name prefix.
+        :param logging.Handler handler: Handler to dispatch records to.
+        :param int level: Minimum level for records to be routed.
+
+        """
+        with self._lock:
+            node = self._root
+            for part in self._split(prefix):
+                node = node.children.setdefault(part, _Node())
+            node.routes = [route for route in node.routes
+                           if route[1] is not handler]
+            node.routes.append((level, handler))
+            self._cache.clear()
+
+    def remove(self, prefix, handler):
+        """Remove the route from ``prefix`` to ``handler``.
+
+        :param str prefix: Logger name prefix.
+        :param logging.Handler handler: Routed handler.
+        :returns: True if a route was removed.
+
+        """
+        with self._lock:
+            path = [self._root]
+            for part in self._split(prefix):
+                node = path[-1].children.get(part)
+                if node is None:
+                    return False
+                path.append(node)
+
+            node = path[-1]
+            routes = [route for route in node.routes if route[1] is not handler]
+            if len(routes) == len(node.routes):
+                return False
+            node.routes = routes
+
+            # Prune empty branches
+            parts = self._split(prefix)
+            for parent, child, part in reversed(list(zip(path, path[1:], parts))):
+                if child.routes or child.children:
+                    break
+                del parent.children[part]
+
+            self._cache.clear()
+            return True
+
+    def discard(self, handler):
+        """Remove all routes to ``handler``."""
+        with self._lock:
+            for node in self._nodes():
+                node.routes = [route for route in node.routes
+                               if route[1] is not handler]
+            self._cache.clear()
+
+    def routes_to(self, handler):
+        """Return the list of prefixes routed to ``handler``."""
+        prefixes = []
+        stack = [(self._root, [])]
+        while stack:
+            node, parts = stack.pop()
+            if any(route[1] is handler for route in node.routes):
+                prefixes.append(".".join(parts))
+            for part, child in node.children.items():
+                stack.append((child, parts + [part]))
+        return prefixes
+
+    def resolve(self, name, levelno):
+        """Return the tuple of handlers a record from logger ``name`` with
+        level ``levelno`` should be dispatched to.
+
+        """
+        try:
+            return self._cache[(name, levelno)]
+        except KeyError:
+            pass
+
+        with self._lock:
+            handlers = []
+            node = self._root
+            parts = iter(self._split(name))
+            while node is not None:
+                for level, handler in node.routes:
+                    if levelno >= level and handler not in handlers:
+                        handlers.append(handler)
+                node = node.children.get(next(parts, None))
+
+            handlers = tuple(handlers)
+            if len(self._cache) >= self.max_cache_size:
+                self._cache.clear()
+            self._cache[(name, levelno)] = handlers
+            return handlers
@@ -1,11 +1,14 @@
 from __future__ import print_function
 
+import os
 import sys
+import errno
+import signal
 import threading as th
 import multiprocessing as mp
 import logging
 import logging.handlers
-from socket import socket, AF_INET, SOCK_DGRAM
+from socket import socket, error as socket_error, AF_INET, SOCK_DGRAM
 from select import select
 
 if sys.version_info.major >= 3:
@@ -16,6 +19,8 @@ else:
     import cPickle as pickle
 
 from . import handlers
+from .routing import RouteTable
+from .profiling import Profiler, CPROFILE
 from ._constants import DEFAULT_FORMAT
 
 try:
@@ -23,6 +28,9 @@ try:
 except ImportError:
     Union = None
 
+# Tag identifying profiling control messages on the handler queue
+_PROFILE = "__profile__"
+
 
 class LogServer(object):
     """Base server for logging from multiple processes or threads."""
@@ -45,6 +53,22 @@ class LogServer(object):
 
         self._runtime_handlers = {}
 
+        # Routes from logger name prefixes to runtime handlers
+        self.routes = RouteTable()
+
+        # Maximum number of datagrams to read and dispatch at once
+        self.batch_size = 256
+
+        # Report file used when profiling is toggled by a signal; defaults to
+        # a file in the working directory named after the server's PID
+        self.profile_path = None
+
+        # Install a SIGUSR1 handler to toggle profiling when running in the
+        # main thread. Off by default so as not to replace a handler the
+        # host application relies on.
+        self.profile_signal = False
+        self._profiler = None  # type: Profiler
+
     def add_handler(self, name, handler_class, *args, **kwargs):
         """Add a new handler to the root logger.
 
@@ -76,6 +100,50 @@ class LogServer(object):
         """
         self._handler_queue.put((name,))
 
+    def add_route(self, prefix, name, level=logging.NOTSET):
+        """Route records from loggers matching a name prefix to a handler
+        previously added with :meth:`add_handler`. Once routed, the handler is
+        detached from the root logger and only receives records from loggers
+        it has routes for.
+
+        :param str prefix: Logger name prefix. ``"worker"`` matches loggers
+            named ``"worker"`` and ``"worker.*"``; an empty string matches all
+            loggers.
+        :param str name: Name given to the handler.
+        :param int level: Minimum level of records to route.
+
+        """
+        self._handler_queue.put((prefix, name, level))
+
+    def remove_route(self, prefix, name):
+        """Remove a route added with :meth:`add_route`. When the last route
+        to a handler is removed, it is attached to the root logger again.
+
+        :param str prefix: Logger name prefix.
+        :param str name: Name given to the handler.
+
+        """
+        self._handler_queue.put((prefix, name))
+
+    def start_profiling(self, path=None, mode=CPROFILE, allocations=False):
+        """Start profiling the running server. Profiling can also be toggled
+        by sending ``SIGUSR1`` to the server process when
+        :attr:`profile_signal` is set.
+
+        :param str path: File to write the report to when profiling is
+            stopped. Defaults to :attr:`profile_path`.
+        :param str mode: ``"cprofile"`` to profile with :mod:`cProfile` or
+            ``"timer"`` to only time decoding and each handler call.
+        :param bool allocations: Also track allocations with
+            :mod:`tracemalloc`.
+
+        """
+        self._handler_queue.put((_PROFILE, path, mode, allocations))
+
+    def stop_profiling(self):
+        """Stop profiling and write the report."""
+        self._handler_queue.put((_PROFILE,))
+
     @staticmethod
     def get_handler_class(name):
         """Returns the class of a handler found in the Python standard library
@@ -131,6 +199,7 @@ class LogServer(object):
         """Thread for listening on the UDP socket."""
         sock = socket(AF_INET, SOCK_DGRAM)
         sock.bind((self.host, self.port))
+        sock.setblocking(False)
 
         def ready():
             socks, _, _ = select([sock], [], [], 1)
@@ -139,9 +208,7 @@ class LogServer(object):
         while not self.done.is_set():
             try:
                 if ready():
-                    data = sock.recv(4096)  # FIXME: more robust length
-                    record = logging.makeLogRecord(pickle.loads(data[4:]))
-                    self.logger.handle(record)
+                    self._handle_datagrams(self._receive(sock))
                 else:
                     self._check_handler_queue()
             except Exception as e:
@@ -149,14 +216,116 @@ class LogServer(object):
 
         sock.close()
 
+    def _receive(self, sock):
+        """Read up to :attr:`batch_size` datagrams which are waiting on the
+        non-blocking socket.
+
+        """
+        datagrams = []
+        while len(datagrams) < self.batch_size:
+            try:
+                datagrams.append(sock.recv(4096))  # FIXME: more robust length
+            except socket_error as e:
+                if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+        return datagrams
+
+    def _handle_datagrams(self, datagrams):
+        """Decode records and pass them to the root logger's handlers and to
+        any routed handlers. Handlers supporting ``handle_batch`` receive all
+        of their records in a single call. Replaced on the instance while
+        profiling.
+
+        """
+        records = []
+        for data in datagrams:
+            try:
+                records.append(self._decode(data))
+            except Exception as e:
+                print(e)
+
+        for handler, batch in self._batches(records):
+            self._handle_batch(handler, batch)
+
+    @staticmethod
+    def _decode(data):
+        """Decode a record sent by a :class:`logging.handlers.DatagramHandler`.
+        Replaced on the instance while profiling with a timer.
+
+        """
+        return logging.makeLogRecord(pickle.loads(data[4:]))
+
+    def _batches(self, records):
+        """Return a list of ``(handler, records)`` pairs for each handler
+        which should receive at least one of the given records. The root
+        logger's ``disabled`` flag and filters apply to routed records too.
+
+        """
+        batches = []
+
+        # Equivalent to Logger.handle for the root logger
+        logger = self.logger
+        if logger.disabled:
+            return batches
+        accepted = [record for record in records if logger.filter(record)]
+
+        for handler in logger.handlers:
+            batch = [record for record in accepted
+                     if record.levelno >= handler.level]
+            if len(batch) > 0:
+                batches.append((handler, batch))
+
+        routed = {}
+        for record in accepted:
+            for handler in self.routes.resolve(record.name, record.levelno):
+                if record.levelno < handler.level:
+                    continue
+                if handler not in routed:
+                    routed[handler] = []
+                    batches.append((handler, routed[handler]))
+                routed[handler].append(record)
+
+        return batches
+
+    @staticmethod
+    def _handle_batch(handler, records):
+        """Pass records to a handler, using ``handle_batch`` if the handler
+        supports it. Errors are printed so that they do not affect other
+        handlers or, when handling records one at a time, other records.
+        Replaced on the instance while profiling with a timer.
+
+        """
+        if hasattr(handler, "handle_batch"):
+            try:
+                handler.handle_batch(records)
+            except Exception as e:
+                print(e)
+        else:
+            for record in records:
+                try:
+                    handler.handle(record)
+                except Exception as e:
+                    print(e)
+
     def _check_handler_queue(self):
         """Thread to check if we need to add or remove a handler."""
         while not self.done.is_set():
             try:
                 msg = self._handler_queue.get(timeout=1)
 
+                # Start, stop, or toggle profiling. All profiling state
+                # changes happen on this thread.
+                if msg[0] == _PROFILE:
+                    if len(msg) == 4:
+                        self._start_profiling(*msg[1:])
+                    elif len(msg) == 2 and self._profiler is None:
+                        self._start_profiling()
+                    else:
+                        self._stop_profiling()
+
                 # Add a handler
-                if len(msg) == 4:
+                elif len(msg) == 4:
                     Handler = self.get_handler_class(msg[1])
                     handler = Handler(*msg[2], **msg[3])
                     handler.setLevel(self.level)
@@ -168,15 +337,66 @@ class LogServer(object):
                 # Remove a handler
                 elif len(msg) == 1:
                     if msg[0] in self._runtime_handlers:
-                        self.logger.removeHandler(self._runtime_handlers[msg[0]])
-                        self._runtime_handlers.pop(msg[0])
+                        handler = self._runtime_handlers.pop(msg[0])
+                        self.logger.removeHandler(handler)
+                        self.routes.discard(handler)
                     else:
                         print("Oops! No handler named", msg[0])
+
+                # Add a route
+                elif len(msg) == 3:
+                    if msg[1] in self._runtime_handlers:
+                        handler = self._runtime_handlers[msg[1]]
+                        self.logger.removeHandler(handler)
+                        self.routes.add(msg[0], handler, msg[2])
+                    else:
+                        print("Oops! No handler named", msg[1])
+
+                # Remove a route
+                elif len(msg) == 2:
+                    if msg[1] in self._runtime_handlers:
+                        handler = self._runtime_handlers[msg[1]]
+                        self.routes.remove(msg[0], handler)
+                        if not self.routes.routes_to(handler):
+                            self.logger.addHandler(handler)
+                    else:
+                        print("Oops! No handler named", msg[1])
             except queue.Empty:
                 pass
             except Exception as e:
                 print(e)
 
+        if self._profiler is not None:
+            self._stop_profiling()
+
+    def _start_profiling(self, path=None, mode=CPROFILE, allocations=False):
+        if self._profiler is not None:
+            print("Oops! Already profiling")
+            return
+        if path is None:
+            path = self.profile_path
+        if path is None:
+            path = "logserver-profile-{:d}.txt".format(os.getpid())
+        profiler = Profiler(self, path, mode, allocations)
+        profiler.start()
+        self._profiler = profiler
+
+    def _stop_profiling(self):
+        if self._profiler is None:
+            print("Oops! Not profiling")
+            return
+        profiler, self._profiler = self._profiler, None
+        profiler.stop()
+        print("Wrote profile to", profiler.path)
+
+    def _toggle_profiling(self, signum=None, frame=None):
+        """Signal handler to start or stop profiling. The signal may arrive
+        while a profiled batch is being handled on this thread, so the
+        transition is deferred to the handler queue thread.
+
+        """
+        self._handler_queue.put((_PROFILE, None))
+
     def run(self):
         self.logger = logging.getLogger()
         self.logger.setLevel(self.level)
@@ -192,9 +412,17 @@ class LogServer(object):
         handler_thread = th.Thread(target=self._check_handler_queue)
         handler_thread.start()
 
+        # Toggle profiling with SIGUSR1 if requested
+        if self.profile_signal and hasattr(signal, "SIGUSR1"):
+            try:
+                signal.signal(signal.SIGUSR1, self._toggle_profiling)
+            except ValueError:
+                pass  # not running in the main thread
+
         # Start server
         sock = socket(AF_INET, SOCK_DGRAM)
         sock.bind((self.host, self.port))
+        sock.setblocking(False)
         self.ready.set()
 
         def ready():
@@ -204,9 +432,7 @@ class LogServer(object):
         while not self.done.is_set():
             try:
                 if ready():
-                    data = sock.recv(4096)  # FIXME: more robust length
-                    record = logging.makeLogRecord(pickle.loads(data[4:]))
-                    self.logger.handle(record)
+                    self._handle_datagrams(self._receive(sock))
                 else:
                     continue
             except Exception as e:
@@ -214,6 +440,9 @@ class LogServer(object):
 
         sock.close()
 
+        # Wait for the handler queue thread to finish any profiling report
+        handler_thread.join()
+
     def stop(self):
         """Signal the server to stop."""
         self.done.set()
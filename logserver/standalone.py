@@ -1,7 +1,11 @@
+from __future__ import print_function
+
 from argparse import ArgumentParser
+import os
+import signal
 import logging
 from . import run_server
-from .handlers import SQLiteHandler
+from .handlers import SQLiteHandler, StreamHandler
 
 
 def main():
@@ -20,7 +24,7 @@ def main():
                         help="SQLite filename")
     args = parser.parse_args()
 
-    stream_handler = logging.StreamHandler()
+    stream_handler = StreamHandler()
     stream_handler.setFormatter(logging.Formatter(
         "[%(levelname)1.1s %(name)s %(asctime)s] %(msg)s"))
 
@@ -30,4 +34,6 @@ def main():
     ]
 
     print("Listening for logs to handle on port", args.port)
-    run_server(handlers, port=args.port)
+    if hasattr(signal, "SIGUSR1"):
+        print("Send SIGUSR1 to PID", os.getpid(), "to toggle profiling")
+    run_server(handlers, port=args.port, profile_signal=True)
@@ -0,0 +1,137 @@
+import os
+import os.path as osp
+import shutil
+import sqlite3
+import sys
+import tempfile
+import logging
+
+import pytest
+
+from ..archive import (
+    export, list_chunks, main, read_archive, read_chunk, read_footer
+)
+from ..handlers import SQLiteHandler
+
+
+@pytest.fixture
+def tempdir():
+    path = tempfile.mkdtemp()
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
+
+
+@pytest.fixture
+def sqlite_path(tempdir):
+    path = osp.join(tempdir, "logs.sqlite")
+    SQLiteHandler(path)
+    insert_rows(path, range(25))
+    yield path
+
+
+def insert_rows(path, indices, timestamps=None):
+    levels = [logging.INFO, logging.WARNING, logging.ERROR]
+    if timestamps is None:
+        timestamps = [1000.0 + i for i in indices]
+    rows = [("test", levels[i % 3], logging.getLevelName(levels[i % 3]),
+             timestamp, __file__, i, "MainThread", "MainProcess",
+             "message " + str(i), None)
+            for i, timestamp in zip(indices, timestamps)]
+
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO logs (name, levelno, levelname, timestamp, pathname, "
+            "lineno, threadName, processName, msg, exc_info) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def test_export(sqlite_path, tempdir):
+    directory = osp.join(tempdir, "archive")
+    paths = export(sqlite_path, directory, batch_size=10)
+    assert len(paths) == 3
+    assert list_chunks(directory) == paths
+
+    footer = read_footer(paths[0])
+    assert footer["rows"] == 10
+    assert footer["time"] == [1000.0, 1009.0]
+    assert footer["levelno"] == [logging.INFO, logging.ERROR]
+    assert "msg" in footer["columns"]
+
+    data = read_chunk(paths[-1], ["msg", "lineno"])
+    assert sorted(data) == ["lineno", "msg"]
+    assert data["msg"] == ["message " + str(i) for i in range(20, 25)]
+    assert data["lineno"] == list(range(20, 25))
+
+    assert not any(name.endswith(".tmp") for name in os.listdir(directory))
+    assert footer["max_id"] == 10
+
+    # Exporting again only appends rows which haven't been archived
+    assert export(sqlite_path, directory, batch_size=10) == []
+    insert_rows(sqlite_path, range(25, 30))
+    paths = export(sqlite_path, directory, batch_size=10)
+    assert len(paths) == 1
+    assert len(list_chunks(directory)) == 4
+
+    ids = [row["id"] for row in read_archive(directory, columns=["id"])]
+    assert ids == list(range(1, 31))
+
+
+def test_export_before_out_of_order(tempdir):
+    path = osp.join(tempdir, "unordered.sqlite")
+    SQLiteHandler(path)
+    insert_rows(path, range(6), [1, 2, 3, 10, 4, 5])
+
+    directory = osp.join(tempdir, "archive")
+    export(path, directory, before=6)
+    ids = [row["id"] for row in read_archive(directory, columns=["id"])]
+    assert ids == [1, 2, 3]
+
+    export(path, directory)
+    ids = [row["id"] for row in read_archive(directory, columns=["id"])]
+    assert ids == [1, 2, 3, 4, 5, 6]
+
+    # All rows are earlier than before
+    directory = osp.join(tempdir, "all")
+    export(path, directory, before=100)
+    assert len(list(read_archive(directory))) == 6
+
+
+def test_export_after_deleting_chunk(sqlite_path, tempdir):
+    paths = export(sqlite_path, tempdir, batch_size=10)
+    os.remove(paths[1])
+
+    insert_rows(sqlite_path, range(25, 30))
+    new_paths = export(sqlite_path, tempdir, batch_size=10)
+    assert new_paths == [osp.join(tempdir, "logs-000003.chunk")]
+    assert read_footer(paths[2])["rows"] == 5
+
+
+def test_read_archive(sqlite_path, tempdir):
+    export(sqlite_path, tempdir, batch_size=10)
+
+    rows = list(read_archive(tempdir))
+    assert len(rows) == 25
+    assert rows[0]["msg"] == "message 0"
+    assert rows[0]["exc_info"] is None
+
+    rows = list(read_archive(tempdir, start=1012, end=1015, columns=["msg"]))
+    assert rows == [{"msg": "message " + str(i)} for i in (12, 13, 14)]
+
+    rows = list(read_archive(tempdir, levelno=logging.ERROR,
+                             columns=["lineno"]))
+    assert [row["lineno"] for row in rows] == list(range(2, 25, 3))
+
+    assert list(read_archive(tempdir, start=2000)) == []
+
+
+def test_invalid_table(sqlite_path, tempdir):
+    with pytest.raises(RuntimeError):
+        export(sqlite_path, tempdir, table_name="logs; DROP TABLE logs")
+
+
+def test_main_unknown_column(sqlite_path, tempdir, monkeypatch):
+    export(sqlite_path, tempdir)
+    monkeypatch.setattr(sys, "argv",
+                        ["archive", "read", tempdir, "-c", "msg,nosuchcol"])
+    with pytest.raises(SystemExit):
+        main()
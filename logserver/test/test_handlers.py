@@ -6,7 +6,12 @@ import sqlite3
 import pytest
 
 from .util import ascii_string
-from ..handlers import SQLiteHandler
+from ..handlers import FileHandler, SQLiteHandler, StreamHandler
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
 
 
 @pytest.fixture
@@ -46,3 +51,74 @@ def test_sqlite_handler(sqlite_path):
     assert "CRITICAL" in levels
     print(exc)
     assert len(exc) > 0
+
+
+def make_records(n, level=logging.INFO):
+    return [logging.makeLogRecord({"name": "test", "levelno": level,
+                                   "levelname": logging.getLevelName(level),
+                                   "msg": "message " + str(i)})
+            for i in range(n)]
+
+
+def test_sqlite_handler_batch(sqlite_path):
+    class Filter(logging.Filter):
+        def filter(self, record):
+            return record.msg != "message 3"
+
+    handler = SQLiteHandler(sqlite_path)
+    handler.addFilter(Filter())
+    handled = handler.handle_batch(make_records(5))
+    assert len(handled) == 4
+
+    with sqlite3.connect(sqlite_path) as conn:
+        res = conn.execute("SELECT msg FROM logs ORDER BY id").fetchall()
+
+    assert [row[0] for row in res] == ["message 0", "message 1", "message 2",
+                                       "message 4"]
+
+
+def test_batch_error_handling(sqlite_path):
+    errors = []
+
+    class Handler(SQLiteHandler):
+        def emit_batch(self, records):
+            raise sqlite3.OperationalError("database is locked")
+
+        def emit(self, record):
+            if record.msg == "message 1":
+                raise sqlite3.OperationalError("database is locked")
+            super(Handler, self).emit(record)
+
+        def handleError(self, record):
+            errors.append(record)
+
+    # Only the failing record is lost when falling back to emit
+    records = make_records(3)
+    Handler(sqlite_path).handle_batch(records)
+    assert errors == [records[1]]
+
+    with sqlite3.connect(sqlite_path) as conn:
+        res = conn.execute("SELECT msg FROM logs ORDER BY id").fetchall()
+
+    assert [row[0] for row in res] == ["message 0", "message 2"]
+
+
+def test_stream_handler_batch():
+    stream = StringIO()
+    handler = StreamHandler(stream)
+    handler.setFormatter(logging.Formatter("%(msg)s"))
+    handler.handle_batch(make_records(3))
+    assert stream.getvalue().splitlines() == ["message 0", "message 1",
+                                              "message 2"]
+
+
+def test_file_handler_batch():
+    path = osp.join(gettempdir(), ascii_string() + ".log")
+    handler = FileHandler(path, delay=True)
+    handler.setFormatter(logging.Formatter("%(msg)s"))
+    handler.handle_batch(make_records(3))
+    handler.close()
+
+    with open(path, "r") as f:
+        assert f.read().splitlines() == ["message 0", "message 1", "message 2"]
+    os.remove(path)
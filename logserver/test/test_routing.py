@@ -0,0 +1,69 @@
+import logging
+
+from ..routing import RouteTable
+
+
+def test_resolve_prefixes():
+    table = RouteTable()
+    worker = logging.NullHandler()
+    api = logging.NullHandler()
+    everything = logging.NullHandler()
+
+    table.add("worker", worker)
+    table.add("api", api, logging.WARNING)
+    table.add("", everything)
+    assert len(table) == 3
+
+    assert table.resolve("worker", logging.INFO) == (everything, worker)
+    assert table.resolve("worker.db", logging.INFO) == (everything, worker)
+    assert table.resolve("workers", logging.INFO) == (everything,)
+    assert table.resolve("api.v1", logging.INFO) == (everything,)
+    assert table.resolve("api.v1", logging.ERROR) == (everything, api)
+
+
+def test_no_duplicate_handlers():
+    table = RouteTable()
+    handler = logging.NullHandler()
+    table.add("a", handler)
+    table.add("a.b", handler)
+    assert table.resolve("a.b.c", logging.INFO) == (handler,)
+
+    # Re-adding a route updates its level
+    table.add("a", handler, logging.ERROR)
+    assert len(table) == 2
+    assert table.resolve("a", logging.INFO) == ()
+
+
+def test_remove_invalidates_cache():
+    table = RouteTable()
+    handler = logging.NullHandler()
+    table.add("a.b", handler)
+    assert table.resolve("a.b", logging.INFO) == (handler,)
+
+    assert not table.remove("a", handler)
+    assert not table.remove("x.y", handler)
+    assert table.remove("a.b", handler)
+    assert table.resolve("a.b", logging.INFO) == ()
+    assert table.routes_to(handler) == []
+    assert len(table) == 0
+
+
+def test_discard():
+    table = RouteTable()
+    handler = logging.NullHandler()
+    table.add("a", handler)
+    table.add("b.c", handler)
+    assert sorted(table.routes_to(handler)) == ["a", "b.c"]
+
+    table.discard(handler)
+    assert table.routes_to(handler) == []
+    assert table.resolve("b.c", logging.CRITICAL) == ()
+
+
+def test_cache_size_is_bounded():
+    table = RouteTable(max_cache_size=10)
+    handler = logging.NullHandler()
+    table.add("", handler)
+    for i in range(25):
+        assert table.resolve("logger" + str(i), logging.INFO) == (handler,)
+        assert len(table._cache) <= 10
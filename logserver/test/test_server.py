@@ -1,5 +1,7 @@
+import os
 import os.path as osp
 import shutil
+import signal
 import logging
 import logging.handlers
 import tempfile
@@ -10,9 +12,17 @@ import pytest
 
 from .util import ascii_string
 from ..handlers import SQLiteHandler
+from ..profiling import tracemalloc
 from ..server import LogServer, LogServerProcess, LogServerThread
 
 
+class SignalHandler(logging.Handler):
+    """Sends SIGUSR1 to its own process while handling a record."""
+    def emit(self, record):
+        if record.msg == "signal":
+            os.kill(os.getpid(), signal.SIGUSR1)
+
+
 @pytest.fixture
 def server_process():
     p = LogServerProcess()
@@ -82,6 +92,65 @@ class TestLogServer:
 
         server.remove_handler("test")
 
+    def test_handle_datagrams(self):
+        server = LogServer()
+        server.logger = logging.getLogger(ascii_string())
+        server.logger.propagate = False
+
+        class BatchHandler(logging.Handler):
+            def __init__(self):
+                super(BatchHandler, self).__init__(logging.WARNING)
+                self.batches = []
+
+            def handle_batch(self, records):
+                self.batches.append([record.msg for record in records])
+
+        class Handler(logging.Handler):
+            def __init__(self):
+                super(Handler, self).__init__()
+                self.records = []
+
+            def handle(self, record):
+                self.records.append(record.msg)
+
+        batch_handler, handler = BatchHandler(), Handler()
+        server.logger.addHandler(batch_handler)
+        server.routes.add("routed", handler)
+
+        datagrams = []
+        for name, level, msg in [("other", logging.INFO, "a"),
+                                 ("routed", logging.ERROR, "b"),
+                                 ("routed.x", logging.WARNING, "c")]:
+            record = logging.makeLogRecord(
+                {"name": name, "levelno": level, "msg": msg})
+            datagrams.append(
+                logging.handlers.SocketHandler(None, None).makePickle(record))
+
+        server._handle_datagrams(datagrams)
+        assert batch_handler.batches == [["b", "c"]]
+        assert handler.records == ["b", "c"]
+
+        # A failing handler doesn't prevent others from handling the batch
+        class FailingHandler(logging.Handler):
+            def handle_batch(self, records):
+                raise RuntimeError("handler failed")
+
+        server.logger.handlers.insert(0, FailingHandler())
+        server._handle_datagrams(datagrams)
+        assert batch_handler.batches == [["b", "c"], ["b", "c"]]
+        assert handler.records == ["b", "c", "b", "c"]
+
+        # Root logger filters apply to routed records too
+        class Filter(logging.Filter):
+            def filter(self, record):
+                return record.msg != "c"
+
+        server.logger.handlers.pop(0)
+        server.logger.addFilter(Filter())
+        server._handle_datagrams(datagrams)
+        assert batch_handler.batches[-1] == ["b"]
+        assert handler.records[-1:] == ["b"]
+
 
 def test_process_log_server(server_process, temp_file):
     server_process.start()
@@ -121,3 +190,117 @@ def test_threaded_log_server(server_thread, temp_file):
 
     server_thread.stop()
     server_thread.join(timeout=1)
+
+
+def test_routed_log_server(server_thread, temp_file):
+    server_thread.start()
+    assert server_thread.ready.wait(timeout=1) is not None
+    server_thread.add_handler("test", "FileHandler", temp_file)
+    server_thread.add_route("routed", "test")
+
+    routed = server_thread.get_logger("routed.child", stream_handler=False)
+    other = server_thread.get_logger(ascii_string(), stream_handler=False)
+    routed_uuid, other_uuid = str(uuid4()), str(uuid4())
+    time.sleep(0.05)
+    routed.info(routed_uuid)
+    other.info(other_uuid)
+    time.sleep(0.05)
+
+    with open(temp_file, 'r') as f:
+        contents = f.read()
+        assert routed_uuid in contents
+        assert other_uuid not in contents
+
+    # Removing the last route attaches the handler to the root logger again
+    server_thread.remove_route("routed", "test")
+    time.sleep(0.05)
+    other.info(other_uuid)
+    time.sleep(0.05)
+
+    with open(temp_file, 'r') as f:
+        assert other_uuid in f.read()
+
+    server_thread.remove_handler("test")
+
+
+@pytest.mark.parametrize("mode", ["cprofile", "timer"])
+def test_profiling(server_thread, temp_file, mode):
+    server_thread.start()
+    assert server_thread.ready.wait(timeout=1) is not None
+    server_thread.add_handler("test", "FileHandler", temp_file)
+
+    report = temp_file + ".prof"
+    allocations = tracemalloc is not None
+    server_thread.start_profiling(report, mode=mode, allocations=allocations)
+    logger = server_thread.get_logger(ascii_string(), stream_handler=False)
+    time.sleep(0.05)
+    for _ in range(10):
+        logger.info("profiled")
+    time.sleep(0.05)
+    server_thread.stop_profiling()
+    time.sleep(0.05)
+
+    with open(report, 'r') as f:
+        contents = f.read()
+    assert "records: 10" in contents
+    assert ("Top allocations" in contents) == allocations
+    if mode == "timer":
+        assert "unpickle" in contents
+        assert "test.handle" in contents
+    else:
+        assert "makeLogRecord" in contents
+
+    # The original datagram handling methods are restored
+    for name in ["_handle_datagrams", "_decode", "_handle_batch"]:
+        assert name not in vars(server_thread)
+
+    server_thread.remove_handler("test")
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGUSR1"), reason="requires SIGUSR1")
+def test_profiling_signal_while_handling(temp_file):
+    report = temp_file + ".prof"
+    server = LogServerProcess([SignalHandler()])
+    server.profile_path = report
+    server.profile_signal = True
+    server.start()
+    try:
+        assert server.ready.wait(timeout=1)
+        server.add_handler("test", "FileHandler", temp_file)
+        server.start_profiling(mode="timer")
+
+        logger = server.get_logger(ascii_string(), stream_handler=False)
+        time.sleep(0.05)
+        logger.info("signal")  # stops profiling from within the timed batch
+        time.sleep(0.1)
+
+        uuid = str(uuid4())
+        logger.info(uuid)
+        time.sleep(0.05)
+
+        with open(temp_file, 'r') as f:
+            assert uuid in f.read()
+        with open(report, 'r') as f:
+            assert "records: 1" in f.read()
+    finally:
+        server.stop()
+        server.join(timeout=3)
+        if server.exitcode is None:
+            server.terminate()
+    assert server.exitcode == 0
+
+
+@pytest.mark.skipif(tracemalloc is None, reason="requires tracemalloc")
+def test_profiling_keeps_tracemalloc(server_thread, temp_file):
+    server_thread.start()
+    assert server_thread.ready.wait(timeout=1) is not None
+
+    tracemalloc.start()
+    try:
+        server_thread.start_profiling(temp_file, allocations=True)
+        server_thread.stop_profiling()
+        time.sleep(0.1)
+        assert osp.exists(temp_file)
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()